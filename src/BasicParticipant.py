@@ -8,7 +8,17 @@ Authors: Samad Kardan (creator), Sebastien Lalle.
 Institution: The University of British Columbia.
 """
 from math import ceil, floor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from copy import deepcopy
+from functools import lru_cache
+import gc
+import hashlib
+import logging
+import os
 import os.path
+import pickle
+import types
+import numpy as np
 
 params = __import__('params')
 from EMDAT_core.data_structures import *
@@ -22,6 +32,26 @@ from EMDAT_eyetracker.TobiiV2Recording import TobiiV2Recording
 from EMDAT_eyetracker.TobiiV3Recording import TobiiV3Recording
 from EMDAT_eyetracker.SMIRecording import SMIRecording
 
+logger = logging.getLogger(__name__)
+
+# how many participants ahead of the current one to prefetch from disk
+PREFETCH_DEPTH = 3
+
+
+@lru_cache(maxsize=256)
+def _partition_cached(segfile, mtime):
+    """partition(segfile), cached per (path, mtime) so that participants sharing
+    one '.seg' file only pay the parse once. Callers must deepcopy the scenelist
+    before mutating it."""
+    return partition(segfile)
+
+
+@lru_cache(maxsize=256)
+def _read_aois_cached(aoifile, mtime):
+    """read_aois(aoifile), cached per (path, mtime). Callers must deepcopy the
+    returned AOIs before mutating them."""
+    return read_aois(aoifile)
+
 
 class BasicParticipant(Participant):
     """
@@ -81,18 +111,17 @@ class BasicParticipant(Participant):
                              log_time_offset, aoifile, prune_length, require_valid_segs,
                              auto_partition_low_quality_segments, rpsdata)
 
-        print("Participant \"" + str(pid) + "\"...")
+        logger.info("Participant \"%s\"...", pid)
 
-        # print files used
-        if params.VERBOSE != "QUIET":
-            print("Reading input files:")
-            print("--Scenes/Segments file: " + segfile)
-            print("--Eye tracking samples file: " + datafile)
-            print("--Fixations file: " + fixfile)
-            print("--Saccades file: " + saccfile if saccfile is not None else "--No saccades file")
-            print("--Events file: " + eventfile if eventfile is not None else "--No events file")
-            print("--AOIs file: " + aoifile if aoifile is not None else "--No AOIs file")
-            print()
+        # log files used; one call per participant instead of a print (and its
+        # stdout flush) per line, which matters once participants run in parallel
+        logger.info("Reading input files:\n%s\n", "\n".join(
+            ["--Scenes/Segments file: " + segfile,
+             "--Eye tracking samples file: " + datafile,
+             "--Fixations file: " + fixfile,
+             "--Saccades file: " + saccfile if saccfile is not None else "--No saccades file",
+             "--Events file: " + eventfile if eventfile is not None else "--No events file",
+             "--AOIs file: " + aoifile if aoifile is not None else "--No AOIs file"]))
 
         self.features = {}
 
@@ -112,25 +141,26 @@ class BasicParticipant(Participant):
         else:
             raise Exception("Unknown eye tracker type.")
 
-        if params.VERBOSE != "QUIET":
-            print("Creating partition...")
+        logger.info("Creating partition...")
 
-        # In Participant.py: Get the scenes and segments specified in the segfile
-        scenelist, self.numofsegments = partition(segfile)
+        # In Participant.py: Get the scenes and segments specified in the segfile.
+        # Participants often share the same '.seg'/'.aoi' files, so the parses are
+        # cached per (path, mtime); deepcopy keeps the cached copy safe to mutate.
+        scenelist, self.numofsegments = _partition_cached(segfile, os.path.getmtime(segfile))
+        scenelist = deepcopy(scenelist)
 
         if self.numofsegments == 0:
             raise Exception("No segments found.")
 
         # In Recording.py: Read the list of AOIs for this experiment from aoifile
         if aoifile is not None:
-            aois = read_aois(aoifile)
+            aois = deepcopy(_read_aois_cached(aoifile, os.path.getmtime(aoifile)))
         else:
             aois = None
 
         self.features['numofsegments'] = self.numofsegments
 
-        if params.VERBOSE != "QUIET":
-            print("Generating features...")
+        logger.info("Generating features...")
 
         # Generate the features for all specified scenes, segments and AOIs
         self.segments, self.scenes = rec.process_rec(scenelist=scenelist, aoilist=aois,
@@ -138,29 +168,34 @@ class BasicParticipant(Participant):
                                                      require_valid_segs=require_valid_segs,
                                                      auto_partition_low_quality_segments=auto_partition_low_quality_segments,
                                                      rpsdata=rpsdata, export_pupilinfo=export_pupilinfo)
-        # Sort segments by their starting timestamp
-        all_segs = sorted(self.segments, key=lambda x: x.start)
+        # Sort segments by their starting timestamp. Extracting the start times
+        # into an array first keeps the attribute lookups out of the sort itself
+        starts = np.fromiter((seg.start for seg in self.segments), dtype=np.int64,
+                             count=len(self.segments))
+        all_segs = [self.segments[i] for i in np.argsort(starts, kind='stable')]
 
         # Generate the features for whole datafile
         self.whole_scene = Scene(str(pid) + '_allsc', [], rec.all_data, rec.fix_data,
                                  saccade_data=rec.sac_data, event_data=rec.event_data,
                                  Segments=all_segs, aoilist=aois, prune_length=prune_length,
                                  require_valid=require_valid_segs, export_pupilinfo=export_pupilinfo)
-        self.scenes.insert(0, self.whole_scene)
+        # Clean memory. The parsed samples are dropped as soon as the whole-datafile
+        # scene is built, so they are not still held while the scenes are cleaned
+        rec.clean_memory()
+        # prepend by building a new list rather than shifting every element with insert(0, ...)
+        self.scenes = [self.whole_scene] + self.scenes
 
-        # Clean memory
         for sc in self.scenes:
             sc.clean_memory()
-        rec.clean_memory()
+        gc.collect()
 
-        if params.VERBOSE != "QUIET":
-            print("Done!")
-            print()
+        logger.info("Done!\n")
 
 
 def read_participants_Basic(datadir, user_list, pids, prune_length=None, aoifile=None,
                             log_time_offsets=None, require_valid_segs=True,
-                            auto_partition_low_quality_segments=False, rpsfile=None):
+                            auto_partition_low_quality_segments=False, rpsfile=None,
+                            rpsdata=None):
     """Generates list of Participant objects. Relevant information is read from input files
 
     Args:
@@ -195,16 +230,23 @@ def read_participants_Basic(datadir, user_list, pids, prune_length=None, aoifile
         rpsfile: If not None, a string containing the name of the '.tsv' file
             with rest pupil sizes for all scenes and for each user.
 
+        rpsdata: If not None, an already-parsed rest pupil size dictionary as
+            returned by read_rest_pupil_sizes. Takes precedence over rpsfile, so
+            callers that read the file for their own purposes (e.g. to build the
+            user list) do not pay for a second parse.
+
     Returns:
         a list Participant objects
     """
-    participants = []
     if log_time_offsets is None:  # setting the default offset which is 1 sec
         log_time_offsets = [1] * len(pids)
 
-    # read rest pupil sizes (rpsvalues) from rpsfile
-    rpsdata = read_rest_pupil_sizes(rpsfile)
+    # read rest pupil sizes (rpsvalues) from rpsfile, unless the caller already
+    # parsed them and passed the dictionary in
+    if rpsdata is None:
+        rpsdata = read_rest_pupil_sizes(rpsfile)
 
+    jobs = []
     for rec, pid, offset in zip(user_list, pids, log_time_offsets):
         # extract pupil sizes for the current user. Set to None if not available
         if rpsdata is not None:
@@ -219,9 +261,10 @@ def read_participants_Basic(datadir, user_list, pids, prune_length=None, aoifile
             sacfile = None
             segfile = os.path.join(datadir, str(rec)+'.seg')
         elif params.EYETRACKERTYPE == "TobiiV3":
+            # the V3 export bundles samples, fixations and saccades in one TSV
             allfile = os.path.join(datadir, str(rec) + '-All-Data.tsv')
-            fixfile = os.path.join(datadir, str(rec) + '-All-Data.tsv')
-            sacfile = os.path.join(datadir, str(rec) + '-All-Data.tsv')
+            fixfile = allfile
+            sacfile = allfile
             evefile = None  # os.path.join(datadir, str(rec) + '-All-Data.tsv')
             segfile = os.path.join(datadir, str(rec) + '.seg')
             # aoifile = "{dir}/Preprocessing/AOIs/{tobii_name}_{rec}.aoi".format(dir=datadir, tobii_name=params.BASE_TOBII_NAME, rec=rec)
@@ -233,14 +276,152 @@ def read_participants_Basic(datadir, user_list, pids, prune_length=None, aoifile
             evefile = "{dir}/SMI_Sample_{rec}_Events.txt".format(dir=datadir, rec=rec)
             segfile = "{dir}/SMI_Sample_{rec}.seg".format(dir=datadir, rec=rec)
 
-        if os.path.exists(allfile):
-            p = BasicParticipant(rec, evefile, allfile, fixfile, sacfile, segfile, log_time_offset=offset,
-                                 aoifile=aoifile, prune_length=prune_length, require_valid_segs=require_valid_segs,
-                                 auto_partition_low_quality_segments=auto_partition_low_quality_segments,
-                                 rpsdata=currpsdata, export_pupilinfo=True)
-            participants.append(p)
+        jobs.append((rec, pid, evefile, allfile, fixfile, sacfile, segfile, offset,
+                     aoifile, prune_length, require_valid_segs,
+                     auto_partition_low_quality_segments, currpsdata))
+
+    # each participant is fully independent, so the reads and feature
+    # generation are dispatched across one process per core; params.PARALLEL
+    # keeps a sequential path for reproducible, easier-to-debug runs
+    if params.PARALLEL:
+        # the frozen job table is shipped to each worker once through the pool
+        # initializer; tasks then carry only an index, so the shared state
+        # (file paths, offsets, rest pupil sizes) is pickled per worker
+        # instead of per participant
+        jobs = tuple(jobs)
+        with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                 initializer=_init_worker_jobs,
+                                 initargs=(jobs,)) as executor:
+            results = list(executor.map(_build_participant_by_index,
+                                        range(len(jobs)), chunksize=4))
+    else:
+        # overlap disk I/O with compute: while one participant is being
+        # processed, background threads stream the next few data files through
+        # the OS page cache so their parse reads from memory instead of disk
+        results = []
+        with ThreadPoolExecutor(max_workers=2) as io_pool:
+            for job in jobs[1:1 + PREFETCH_DEPTH]:
+                io_pool.submit(_warm_page_cache, job[3])
+            for index, job in enumerate(jobs):
+                results.append(_build_participant(job))
+                upcoming = index + 1 + PREFETCH_DEPTH
+                if upcoming < len(jobs):
+                    io_pool.submit(_warm_page_cache, jobs[upcoming][3])
+
+    return [p for p in results if p is not None]
+
+
+# job table installed into each pool worker by _init_worker_jobs
+_worker_jobs = None
+
+
+def _init_worker_jobs(jobs):
+    """Stores the frozen job table in the worker process, once per worker."""
+    global _worker_jobs
+    _worker_jobs = jobs
+
+
+def _build_participant_by_index(index):
+    """Builds the participant at `index` of the job table shipped at pool startup."""
+    return _build_participant(_worker_jobs[index])
+
+
+def _warm_page_cache(path):
+    """Pulls a file into the OS page cache ahead of its parse.
+
+    Runs on a background thread so the read of an upcoming participant's data
+    file overlaps with the compute of the current one. Where the platform
+    offers posix_fadvise (Linux and most Unixes), a single WILLNEED hint asks
+    the kernel to read the whole file ahead asynchronously, without copying a
+    byte into this process; elsewhere the file is read and discarded. Errors
+    are ignored here; the real open in the reader reports them."""
+    try:
+        with open(path, 'rb') as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            else:
+                while f.read(1 << 20):
+                    pass
+    except (OSError, TypeError):
+        pass
+
+
+@lru_cache(maxsize=1)
+def _params_fingerprint():
+    """Returns a short hash of the current params configuration.
+
+    Folded into the participant cache key so that changing any setting that
+    shapes the computed features — feature lists, pupil adjustment, validity
+    thresholds and so on — invalidates previously cached participants instead
+    of silently serving results computed under the old configuration."""
+    settings = []
+    for name in sorted(vars(params)):
+        value = getattr(params, name)
+        if name.startswith('_') or isinstance(value, types.ModuleType) or callable(value):
+            continue
+        settings.append("{0}={1!r}".format(name, value))
+    return hashlib.blake2b(";".join(settings).encode(), digest_size=8).hexdigest()
+
+
+def _participant_cache_path(pid, allfile, segfile, aoifile=None):
+    """Returns the cache file for one participant, keyed by the mtime and size
+    of every input file it was built from plus the params fingerprint."""
+    key = [_params_fingerprint()]
+    # the cached participant depends on the segmentation (and AOIs, when set)
+    # just as much as on the gaze data, so all of them key the entry
+    for path in (allfile, segfile, aoifile):
+        if path is None:
+            key.append("-")
         else:
-            log_to_file("Error reading participant files for: " + str(pid) + " FILE NOT FOUND\n")
+            st = os.stat(path)
+            key.append("{0}-{1}".format(st.st_mtime, st.st_size))
+    h = hashlib.blake2b(";".join(key).encode(), digest_size=8).hexdigest()
+    return os.path.join(os.path.dirname(allfile), 'EMDAT', '.cache',
+                        "{0}-{1}.pkl".format(pid, h))
 
-            warn("Error reading participant files for: " + str(pid))
-    return participants
+
+def _build_participant(job):
+    """Builds one BasicParticipant from a job tuple prepared by read_participants_Basic.
+
+    Module-level so it can be pickled and run in a worker process. Returns the
+    BasicParticipant, or None if the input files for that participant are missing.
+    With params.CACHE_PARTICIPANTS, an unchanged participant is unpickled from
+    disk instead of being re-parsed and recomputed.
+    """
+    (rec, pid, evefile, allfile, fixfile, sacfile, segfile, offset,
+     aoifile, prune_length, require_valid_segs,
+     auto_partition_low_quality_segments, currpsdata) = job
+
+    if os.path.exists(allfile):
+        if params.CACHE_PARTICIPANTS:
+            cache_path = _participant_cache_path(pid, allfile, segfile, aoifile)
+            if os.path.exists(cache_path):
+                try:
+                    with open(cache_path, 'rb') as f:
+                        return pickle.load(f)
+                except Exception:
+                    # a corrupt entry (e.g. from a killed run) is rebuilt and
+                    # overwritten below instead of crashing every future run
+                    pass
+
+        participant = BasicParticipant(rec, evefile, allfile, fixfile, sacfile, segfile, log_time_offset=offset,
+                                       aoifile=aoifile, prune_length=prune_length, require_valid_segs=require_valid_segs,
+                                       auto_partition_low_quality_segments=auto_partition_low_quality_segments,
+                                       rpsdata=currpsdata, export_pupilinfo=True)
+
+        if params.CACHE_PARTICIPANTS:
+            # write to a temp file and rename it into place, so an interrupted
+            # run never leaves a truncated pickle behind (same approach as the
+            # All-Data cache)
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = "{0}.{1}.tmp".format(cache_path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(participant, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+
+        return participant
+
+    log_to_file("Error reading participant files for: " + str(pid) + " FILE NOT FOUND\n")
+
+    warn("Error reading participant files for: " + str(pid))
+    return None
@@ -9,7 +9,7 @@ Generic class to handle eye tracking and events data for one Participant in the
 Institution: The University of British Columbia.
 """
 
-import string
+from functools import lru_cache
 import params
 import EMDAT_core
 from EMDAT_core.data_structures import *
@@ -18,6 +18,21 @@ from EMDAT_core.Recording import *
 from EMDAT_core.utils import log_to_file
 
 
+@lru_cache(maxsize=None)
+def _row_formatter(width):
+    """Returns a function formatting a row of `width` values as one tab-separated line.
+
+    The function body is generated and compiled once per distinct row width, so
+    formatting a row is a single straight-line f-string instead of a str() call
+    per cell plus a join per row. The feature list is fixed for a run, so the
+    cache holds one formatter in practice.
+    """
+    cells = "\\t".join("{row[%d]}" % i for i in range(width))
+    namespace = {}
+    exec('def fmt(row):\n    return f"' + cells + '\\n"', namespace)
+    return namespace["fmt"]
+
+
 class Participant():
     """
     A class that holds the information for one Participant in the experiment
@@ -183,10 +198,8 @@ class Participant():
         featnames, data = self.export_features(featurelist, aoifeaturelist=aoifeaturelist,
                                                id_prefix=id_prefix, require_valid=require_valid)
 
-        ret = string.join(featnames, '\t') + '\n'
-        for t in data:
-            ret += (string.join(map(str, t), '\t') + '\n')
-        return ret
+        fmt = _row_formatter(len(featnames))
+        return '\t'.join(featnames) + '\n' + ''.join([fmt(t) for t in data])
 
     def print_(self):
         """Outputs all feature names and their values for this Participant to the console
@@ -242,10 +255,13 @@ class Participant():
             print(format_list(sc_feats, l))
 
     def write_raw_data(self, filename_all, filename_fix, filename_sac, filename_ev):
-        f_all = open(filename_all, 'wb')
-        f_fix = open(filename_fix, 'wb')
-        f_sac = open(filename_sac, 'wb')
-        f_ev = open(filename_ev, 'wb')
+        # rows are joined and written a block at a time through 1 MiB buffers,
+        # so each file sees a few large writes instead of one per row
+        block = 1024
+        f_all = open(filename_all, 'w', buffering=1024 * 1024)
+        f_fix = open(filename_fix, 'w', buffering=1024 * 1024)
+        f_sac = open(filename_sac, 'w', buffering=1024 * 1024)
+        f_ev = open(filename_ev, 'w', buffering=1024 * 1024)
         sep = '\t'
         f_all.write(
             "scene" + sep + "timestamp" + sep + "rawpupilsize" + sep + "pupilvelocity" + sep + "headdistance" + sep + "is_valid" + sep + "stimuliname" + sep +
@@ -261,20 +277,45 @@ class Participant():
         f_ev.write(
             "scene" + sep + "timestamp" + sep + "event" + sep + "event_key" + sep + "x_coord" + sep + "y_coord" + sep + "key_code" + sep + "key_name" + sep + "description" + sep + "\n")
 
+        def flush(f, rows):
+            if rows:
+                f.write('\n'.join(rows) + '\n')
+                del rows[:]
+
+        rows_all = []
+        rows_fix = []
+        rows_sac = []
+        rows_ev = []
         for sc in self.scenes:
             for sg in sc.segments:
+                prefix = str(sc.scid) + str(sg.segid) + sep
 
                 for ad in sg.all_data:
-                    f_all.write(str(sc.scid) + str(sg.segid) + sep + ad.get_string() + '\n')
+                    rows_all.append(prefix + ad.get_string())
                 for af in sg.fixation_data:
-                    f_fix.write(str(sc.scid) + str(sg.segid) + sep + af.get_string() + '\n')
+                    rows_fix.append(prefix + af.get_string())
                 for asa in sg.saccade_data:
-                    f_sac.write(str(sc.scid) + str(sg.segid) + sep + asa.get_string() + '\n')
+                    rows_sac.append(prefix + asa.get_string())
                 for ae in sg.event_data:
-                    f_ev.write(str(sc.scid) + str(sg.segid) + sep + ae.get_string() + '\n')
-
+                    rows_ev.append(prefix + ae.get_string())
+
+                if len(rows_all) >= block:
+                    flush(f_all, rows_all)
+                if len(rows_fix) >= block:
+                    flush(f_fix, rows_fix)
+                if len(rows_sac) >= block:
+                    flush(f_sac, rows_sac)
+                if len(rows_ev) >= block:
+                    flush(f_ev, rows_ev)
+
+        flush(f_all, rows_all)
+        flush(f_fix, rows_fix)
+        flush(f_sac, rows_sac)
+        flush(f_ev, rows_ev)
         f_all.close()
         f_fix.close()
+        f_sac.close()
+        f_ev.close()
 
 
 def read_participants(segsdir, datadir, prune_length=None, aoifile=None):
@@ -363,12 +404,14 @@ def write_features_tsv(participants, outfile, featurelist=None, aoifeaturelist=N
                                         aoifeaturelist=aoifeaturelist, id_prefix=id_prefix)
     part_orig = set()
     [part_orig.add(p.pid) for p in participants]
-    part_remaining = set()
-    with open(outfile, 'w') as f:
-        f.write(string.join(fnames, '\t') + '\n')
-        for l in fvals:
-            f.write(string.join(map(str, l), '\t') + '\n')
-            part_remaining.add(l[0])
+    # per-cell str() keeps the exact formatting of the row-at-a-time writer
+    # (int sentinels stay "-1", None stays "None"); the rows are then joined
+    # and pushed through one large buffered write instead of a write per row
+    with open(outfile, 'w', buffering=1024 * 1024) as f:
+        f.write('\t'.join(fnames) + '\n')
+        if fvals:
+            f.write('\n'.join(['\t'.join(map(str, l)) for l in fvals]) + '\n')
+    part_remaining = set(l[0] for l in fvals)
 
     part_lost = part_orig.symmetric_difference(part_remaining)
     for p in part_lost:
@@ -9,6 +9,94 @@ Institution: The University of British Columbia.
 from warnings import warn
 
 
+class DatapointArray:
+    """
+    A structure-of-arrays container for the gaze samples of one recording
+
+    Stores one numpy array per sample field instead of one Datapoint object per
+    sample, which cuts the memory footprint of a long recording by an order of
+    magnitude. Indexing synthesizes "Datapoint"s on demand, so the container can
+    stand in for a list of "Datapoint"s in existing code (integer and negative
+    indexing, slicing, len() and iteration all behave like a list).
+    """
+
+    def __init__(self, timestamps, pupilsizes, pupilvelocities, distances, is_valids,
+                 is_valid_blinks=None, fixationindices=None, gazepointxs=None,
+                 gazepointys=None, stimuliname=None):
+        """Inits DatapointArray from one array per sample field
+
+        Args:
+            timestamps: array of sample timestamps (ms)
+            pupilsizes: array of pupil sizes (-1 when not recorded)
+            pupilvelocities: array of pupil velocities (-1 when not recorded)
+            distances: array of head distances (-1 when not recorded)
+            is_valids: boolean array indicating whether each sample is valid
+            is_valid_blinks: if not None, boolean array indicating whether each
+                sample is valid for blink detection
+            fixationindices: if not None, float array of fixation indices
+                (NaN for samples outside a fixation)
+            gazepointxs: if not None, float array of gaze x coordinates
+                (NaN when not recorded)
+            gazepointys: if not None, float array of gaze y coordinates
+                (NaN when not recorded)
+            stimuliname: if not None, the stimuli name shared by all samples
+
+        Yields:
+            a DatapointArray object
+        """
+        self.timestamps = timestamps
+        self.pupilsizes = pupilsizes
+        self.pupilvelocities = pupilvelocities
+        self.distances = distances
+        self.is_valids = is_valids
+        self.is_valid_blinks = is_valid_blinks
+        self.fixationindices = fixationindices
+        self.gazepointxs = gazepointxs
+        self.gazepointys = gazepointys
+        self.stimuliname = stimuliname
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def _optional(self, field, index):
+        """Returns field[index] as a Python scalar, mapping NaN (and an absent
+        field array) to None."""
+        if field is None:
+            return None
+        value = field[index]
+        if value != value:  # NaN marks a missing value
+            return None
+        return value
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return DatapointArray(self.timestamps[index], self.pupilsizes[index],
+                                  self.pupilvelocities[index], self.distances[index],
+                                  self.is_valids[index],
+                                  is_valid_blinks=None if self.is_valid_blinks is None else self.is_valid_blinks[index],
+                                  fixationindices=None if self.fixationindices is None else self.fixationindices[index],
+                                  gazepointxs=None if self.gazepointxs is None else self.gazepointxs[index],
+                                  gazepointys=None if self.gazepointys is None else self.gazepointys[index],
+                                  stimuliname=self.stimuliname)
+        fixationindex = self._optional(self.fixationindices, index)
+        gazepointx = self._optional(self.gazepointxs, index)
+        gazepointy = self._optional(self.gazepointys, index)
+        return Datapoint(timestamp=int(self.timestamps[index]),
+                         pupilsize=float(self.pupilsizes[index]),
+                         pupilvelocity=float(self.pupilvelocities[index]),
+                         distance=float(self.distances[index]),
+                         is_valid=bool(self.is_valids[index]),
+                         is_valid_blink=None if self.is_valid_blinks is None else bool(self.is_valid_blinks[index]),
+                         stimuliname=self.stimuliname,
+                         fixationindex=None if fixationindex is None else int(fixationindex),
+                         gazepointx=None if gazepointx is None else float(gazepointx),
+                         gazepointy=None if gazepointy is None else float(gazepointy))
+
+    def __iter__(self):
+        for i in range(len(self.timestamps)):
+            yield self[i]
+
+
 class Datapoint:
     """
     A class that holds the information for one eye gaze data sample (one line of data logs)
@@ -20,28 +108,33 @@ class Datapoint:
         Please refer to the Tobii manual for the description of the rest of the attributes
     """
 
-    def __init__(self, data):
+    __slots__ = ("timestamp", "pupilsize", "pupilvelocity", "distance", "is_valid",
+                 "is_valid_blink", "stimuliname", "fixationindex", "gazepointx",
+                 "gazepointy", "segid")
+
+    def __init__(self, timestamp=None, pupilsize=None, pupilvelocity=None,
+                 distance=None, is_valid=None, is_valid_blink=None, stimuliname=None,
+                 fixationindex=None, gazepointx=None, gazepointy=None):
         """
-        Initializes a Datapoint from either a line of gaze data from "all-Data.tsv"
-        or the equivalent data in array form.
+        Initializes a Datapoint from the parsed fields of one line of gaze data.
 
-        Args:
-            tobii_line: a line of gaze data from "all-Data.tsv"
-            data: An already parsed line of Tobii data
+        Fields that a given eye tracker does not export can simply be omitted.
+        The class is slotted and takes its fields as arguments directly, so
+        constructing a sample does not allocate an intermediate dict.
 
         Yields:
             a Datapoint object
         """
-        self.timestamp = data.get("timestamp", None)
-        self.pupilsize = data.get("pupilsize", None)
-        self.pupilvelocity = data.get("pupilvelocity", None)
-        self.distance = data.get("distance", None)
-        self.is_valid = data.get("is_valid", None)
-        self.is_valid_blink = data.get("is_valid_blink", None)
-        self.stimuliname = data.get("stimuliname", None)
-        self.fixationindex = data.get("fixationindex", None)
-        self.gazepointx = data.get("gazepointx", None)
-        self.gazepointy = data.get("gazepointy", None)
+        self.timestamp = timestamp
+        self.pupilsize = pupilsize
+        self.pupilvelocity = pupilvelocity
+        self.distance = distance
+        self.is_valid = is_valid
+        self.is_valid_blink = is_valid_blink
+        self.stimuliname = stimuliname
+        self.fixationindex = fixationindex
+        self.gazepointx = gazepointx
+        self.gazepointy = gazepointy
         self.segid = None
 
     def get_string(self, sep='\t'):
@@ -55,6 +148,9 @@ class Fixation:
         segid: a string indicating the Segment to which this Fixation belongs
     """
 
+    __slots__ = ("fixationindex", "timestamp", "fixationduration",
+                 "mappedfixationpointx", "mappedfixationpointy", "segid")
+
     def __init__(self, data, media_offset = (0, 0)):
         """Initializes a Fixation with attributes
 
@@ -117,6 +213,11 @@ class Saccade:
         segid: a string indicating the Segment to which this Saccade belongs
     """
 
+    __slots__ = ("saccadeindex", "timestamp", "saccadeduration", "saccadedistance",
+                 "saccadespeed", "saccadeacceleration", "saccadestartpointx",
+                 "saccadestartpointy", "saccadeendpointx", "saccadeendpointy",
+                 "saccadequality", "segid")
+
     def __init__(self, data, media_offset = (0, 0)):
         """Initializes a Saccade with attributes
 
@@ -10,7 +10,9 @@ Institution: The University of British Columbia.
 
 from EMDAT_core.data_structures import Fixation
 import params
+import atexit
 import math
+import numpy as np
 
 
 def point_inside_polygon(x,y,poly):
@@ -133,8 +135,8 @@ def stddev(data):
     """
     if len(data)< 2:
         return float('nan')
-    m = mean(data)
-    return math.sqrt(sum(map(lambda x: (x-m)**2, data))/float(len(data)-1))
+    # one vectorized reduction instead of a Python lambda call per element
+    return float(np.std(np.asarray(data, dtype=np.float64), ddof=1))
 
 
 def mean(data):
@@ -148,7 +150,7 @@ def mean(data):
     """
     if len(data)==0:
         return 0
-    return sum(data) / float(len(data))
+    return float(np.asarray(data, dtype=np.float64).mean())
 
 def generate_event_lists(event_data):
     """Returns separate list per type of events. Format:
@@ -235,8 +237,15 @@ def list_to_string(list, separator = "\t"):
     """
     return separator.join(map(str, list))+ "\n"
 
+_log_file = None
+
 def log_to_file(STR):
-    outF = open(params.CANARY_OUTPUT_LOG, "a")
-    outF.write(STR)
-    outF.close()
+    # the log file is opened once on first use and kept line-buffered, instead
+    # of paying an open/close pair of syscalls for every message; append mode
+    # preserves the truncate-at-start behavior of the driver scripts
+    global _log_file
+    if _log_file is None:
+        _log_file = open(params.CANARY_OUTPUT_LOG, "a", buffering=1)
+        atexit.register(_log_file.close)
+    _log_file.write(STR)
     
@@ -38,18 +38,16 @@ class SMIRecording(Recording):
                 distance_left = EMDAT_core.utils.cast_float(row["L EPOS Z"], -1)
                 distance_right = EMDAT_core.utils.cast_float(row["R EPOS Z"], -1)
                 timestamp = EMDAT_core.utils.cast_int(row["Time"])
-                data = {"timestamp": timestamp,
-                        "pupilsize": EMDAT_core.Recording.get_pupil_size(pupil_left, pupil_right),
-                        "pupilvelocity": EMDAT_core.Recording.get_pupil_velocity(last_pupil_left, last_pupil_right, pupil_left, pupil_right, (timestamp-last_time) ),
-                        "distance": EMDAT_core.Recording.get_distance(distance_left, distance_right),
-                        "is_valid": (EMDAT_core.utils.cast_float(row["L POR X [px]"], -1) > 0 and EMDAT_core.utils.cast_float(row["L POR Y [px]"], -1) > 0 )
-                                              or (EMDAT_core.utils.cast_float(row["R POR X [px]"], -1) > 0 and EMDAT_core.utils.cast_float(row["R POR Y [px]"], -1) > 0),
-                        "stimuliname": "Screen",  # temporarily set to the same stimuli
-                        "is_valid_blink": not ("Blink" in row['L Event Info'] or "Blink" in row['R Event Info']),
-                        "fixationindex": EMDAT_core.utils.cast_int(row["Time"]),
-                        "gazepointxleft": EMDAT_core.utils.cast_float(row["L POR X [px]"]),
-                        "gazepointxlright": EMDAT_core.utils.cast_float(row["R POR X [px]"])}
-                all_data.append(Datapoint(data))
+                all_data.append(Datapoint(
+                    timestamp=timestamp,
+                    pupilsize=EMDAT_core.Recording.get_pupil_size(pupil_left, pupil_right),
+                    pupilvelocity=EMDAT_core.Recording.get_pupil_velocity(last_pupil_left, last_pupil_right, pupil_left, pupil_right, (timestamp-last_time) ),
+                    distance=EMDAT_core.Recording.get_distance(distance_left, distance_right),
+                    is_valid=(EMDAT_core.utils.cast_float(row["L POR X [px]"], -1) > 0 and EMDAT_core.utils.cast_float(row["L POR Y [px]"], -1) > 0 )
+                                          or (EMDAT_core.utils.cast_float(row["R POR X [px]"], -1) > 0 and EMDAT_core.utils.cast_float(row["R POR Y [px]"], -1) > 0),
+                    stimuliname="Screen",  # temporarily set to the same stimuli
+                    is_valid_blink=not ("Blink" in row['L Event Info'] or "Blink" in row['R Event Info']),
+                    fixationindex=EMDAT_core.utils.cast_int(row["Time"])))
                 last_pupil_left = pupil_left
                 last_pupil_right = pupil_right
                 last_time = timestamp
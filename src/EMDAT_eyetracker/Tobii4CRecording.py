@@ -45,16 +45,16 @@ class Tobii4CRecording(Recording):
                 pupil_left = EMDAT_core.utils.cast_float(row["left_pupil_diameter"], -1)
                 pupil_right = EMDAT_core.utils.cast_float(row["right_pupil_diameter"], -1)
                 timestamp = EMDAT_core.utils.cast_int(EMDAT_core.utils.cast_float(row["system_time_stamp"]))
-                data = {"timestamp": timestamp,
-                        "pupilsize": EMDAT_core.Recording.get_pupil_size(pupil_left, pupil_right),
-                        "pupilvelocity": EMDAT_core.Recording.get_pupil_velocity(last_pupil_left, last_pupil_right, pupil_left, pupil_right, (timestamp-last_time) ),
-                        "distance": -1,
-                        "is_valid": EMDAT_core.utils.cast_int(row["right_gaze_origin_validity"]) == 1 or EMDAT_core.utils.cast_int(row["left_gaze_origin_validity"]) == 1,
-                        "is_valid_blink": EMDAT_core.utils.cast_int(row["right_gaze_origin_validity"]) == 1 and EMDAT_core.utils.cast_int(row["left_gaze_origin_validity"]) == 1,
-                        "fixationindex": currentfix,
-                        "gazepointx": gaze_point_x,
-                        "gazepointy": gaze_point_y}
-                all_data.append(Datapoint(data))
+                all_data.append(Datapoint(
+                    timestamp=timestamp,
+                    pupilsize=EMDAT_core.Recording.get_pupil_size(pupil_left, pupil_right),
+                    pupilvelocity=EMDAT_core.Recording.get_pupil_velocity(last_pupil_left, last_pupil_right, pupil_left, pupil_right, (timestamp-last_time) ),
+                    distance=-1,
+                    is_valid=EMDAT_core.utils.cast_int(row["right_gaze_origin_validity"]) == 1 or EMDAT_core.utils.cast_int(row["left_gaze_origin_validity"]) == 1,
+                    is_valid_blink=EMDAT_core.utils.cast_int(row["right_gaze_origin_validity"]) == 1 and EMDAT_core.utils.cast_int(row["left_gaze_origin_validity"]) == 1,
+                    fixationindex=currentfix,
+                    gazepointx=gaze_point_x,
+                    gazepointy=gaze_point_y))
                 last_pupil_left = pupil_left
                 last_pupil_right = pupil_right
                 last_time = timestamp
@@ -9,56 +9,97 @@ Institution: The University of British Columbia.
 """
 
 from EMDAT_core.Recording import *
-from EMDAT_core.data_structures import Datapoint, Fixation, Saccade, Event
+from EMDAT_core.data_structures import Datapoint, DatapointArray, Fixation, Saccade, Event
 from EMDAT_core.utils import *
-import csv
+import hashlib
+import math
+import os
+import numpy as np
+import pandas as pd
 import params
 
+try:
+    from numba import njit as _njit
+except ImportError:  # numba is optional; the saccade kernel also runs as plain Python
+    _njit = None
+
+
+def _maybe_jit(func):
+    """Compiles func with numba when it is installed, otherwise returns it unchanged."""
+    if _njit is not None:
+        return _njit(cache=True)(func)
+    return func
+
+
+# GazeEventType codes used by the saccade kernel
+EV_FIXATION = 0
+EV_SACCADE = 1
+EV_UNCLASSIFIED = 2
+
 
 class TobiiV2Recording(Recording):
     def read_all_data(self, all_file):
-        """Returns a list of "Datapoint"s read from an "All-Data" file.
+        """Returns the samples read from an "All-Data" file as a "DatapointArray".
 
         Args:
             all_file:A string containing the name of the 'All-Data.tsv' file output by the Tobii software.
 
         Returns:
-            a list of "Datapoint"s
+            a DatapointArray (a list-compatible structure-of-arrays of "Datapoint"s)
         """
-        all_data = []
-        with open(all_file, 'r') as f:
-            # for _ in xrange(params.ALLDATAHEADERLINES + params.NUMBEROFEXTRAHEADERLINES - 1):
-            #     next(f)
-            reader = csv.DictReader(f, delimiter="\t")
-            last_pupil_left = None
-            last_pupil_right = None
-            last_time = -1
-
-            for row in reader:
-                # if not row["Number"]:  # ignore invalid data point
-                #     continue
-                pupil_left = None  # cast_float(row["PupilLeft"], -1)
-                pupil_right = None  # cast_float(row["PupilRight"], -1)
-                distance_left = None  # cast_float(row["DistanceLeft"], -1)
-                distance_right = None  # cast_float(row["DistanceRight"], -1)
-                timestamp = int(float(row["RecordingTimestamp"]))  # cast_int(row["Timestamp"])
-                data = {"timestamp": timestamp,
-                        "pupilsize": get_pupil_size(pupil_left, pupil_right),
-                        "pupilvelocity": get_pupil_velocity(last_pupil_left, last_pupil_right, pupil_left, pupil_right,
-                                                            (timestamp - last_time)),
-                        "distance": get_distance(distance_left, distance_right),
-                        "is_valid": True,  # cast_int(row["ValidityRight"]) < 2 or cast_int(row["ValidityLeft"]) < 2,
-                        "is_valid_blink": None,
-                        # cast_int(row["ValidityRight"]) < 2 and cast_int(row["ValidityLeft"]) < 2,
-                        "stimuliname": None,  # row["StimuliName"],
-                        "fixationindex": None,  # cast_int(row["FixationIndex"]),
-                        "gazepointxleft": float(row["avg_x"])}
-                all_data.append(Datapoint(data))
-                last_pupil_left = pupil_left
-                last_pupil_right = pupil_right
-                last_time = timestamp
-
-        return all_data
+        # re-running the pipeline while iterating on features re-parses the same
+        # TSVs every time, so with params.CACHE_ALLDATA the parsed arrays are
+        # cached on disk keyed by the file path and mtime; a stale cache entry
+        # is simply never looked up again
+        cache_file = None
+        if params.CACHE_ALLDATA:
+            cache_key = hashlib.sha1((all_file + str(os.path.getmtime(all_file))).encode()).hexdigest()
+            cache_file = os.path.join(os.path.expanduser("~"), ".cache", "emdat", cache_key + ".npz")
+            if os.path.exists(cache_file):
+                cached = np.load(cache_file)
+                return DatapointArray(cached["timestamps"], cached["pupil_sizes"],
+                                      cached["velocities"], cached["distances"],
+                                      cached["is_valids"])
+
+        # parse the only column we actually use in one vectorized pass instead of
+        # building a dict per row with csv.DictReader; memory_map lets the parser
+        # scan the mapped file directly rather than copying it through read buffers
+        df = pd.read_csv(all_file, sep='\t', usecols=["RecordingTimestamp"],
+                         memory_map=True)
+        timestamps = df["RecordingTimestamp"].to_numpy(dtype=np.float64).astype(np.int64)
+
+        # pupil size is not exported for this dataset, so every sample carries the
+        # -1 sentinel that get_pupil_size returns for missing data
+        pupil_sizes = np.full(len(timestamps), -1.0)
+
+        # velocity = |delta pupil| / delta t computed as one vectorized diff instead
+        # of a get_pupil_velocity call per row; samples without pupil data on either
+        # side of the diff keep the -1 sentinel, so when no sample has pupil data
+        # the diff is skipped outright
+        velocities = np.full(len(timestamps), -1.0)
+        if len(timestamps) > 1 and np.any(pupil_sizes >= 0):
+            dt = np.diff(timestamps).astype(np.float64)
+            dp = np.abs(np.diff(pupil_sizes))
+            have_pupil = (pupil_sizes[1:] >= 0) & (pupil_sizes[:-1] >= 0) & (dt > 0)
+            velocities[1:][have_pupil] = dp[have_pupil] / dt[have_pupil]
+
+        # keep the whole recording as one array per field instead of a Datapoint
+        # object per sample; head distance is not exported for this dataset and
+        # every sample counts as valid, matching the per-row reader this replaces
+        distances = np.full(len(timestamps), float(get_distance(None, None)))
+        is_valids = np.ones(len(timestamps), dtype=np.bool_)
+
+        if cache_file is not None:
+            # write to a temp file and rename it into place, so an interrupted
+            # run never leaves a truncated archive behind for np.load to choke on
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            tmp_file = "{0}.{1}.tmp".format(cache_file, os.getpid())
+            with open(tmp_file, 'wb') as f:
+                np.savez(f, timestamps=timestamps, pupil_sizes=pupil_sizes,
+                         velocities=velocities, distances=distances, is_valids=is_valids)
+            os.replace(tmp_file, cache_file)
+
+        return DatapointArray(timestamps, pupil_sizes, velocities, distances, is_valids)
 
     def read_fixation_data(self, fixation_file):
         """Returns a list of "Fixation"s read from an "Fixation-Data" file.
@@ -70,18 +111,24 @@ class TobiiV2Recording(Recording):
             a list of "Fixation"s
         """
 
+        df = pd.read_csv(fixation_file, sep='\t',
+                         usecols=["Unnamed: 0", "starttime", "duration", "endx", "endy"])
+        fixation_indices = df["Unnamed: 0"].to_numpy(dtype=np.float64).astype(np.int64)
+        timestamps = df["starttime"].to_numpy(dtype=np.float64).astype(np.int64)
+        durations = df["duration"].to_numpy(dtype=np.float64).astype(np.int64)
+        points_x = df["endx"].to_numpy(dtype=np.float64).astype(np.int64)
+        points_y = df["endy"].to_numpy(dtype=np.float64).astype(np.int64)
+
         all_fixation = []
-        with open(fixation_file, 'r') as f:
-            # for _ in xrange(params.FIXATIONHEADERLINES - 1):
-            #     next(f)
-            reader = csv.DictReader(f, delimiter='\t')
-            for row in reader:
-                data = {"fixationindex": cast_int(row["Unnamed: 0"]),
-                        "timestamp": int(float(row["starttime"])),
-                        "fixationduration": int(float(row["duration"])),
-                        "fixationpointx": int(float(row["endx"])),
-                        "fixationpointy": int(float(row["endy"]))}
-                all_fixation.append(Fixation(data, self.media_offset))
+        for fixationindex, timestamp, duration, pointx, pointy in zip(
+                fixation_indices.tolist(), timestamps.tolist(), durations.tolist(),
+                points_x.tolist(), points_y.tolist()):
+            data = {"fixationindex": fixationindex,
+                    "timestamp": timestamp,
+                    "fixationduration": duration,
+                    "fixationpointx": pointx,
+                    "fixationpointy": pointy}
+            all_fixation.append(Fixation(data, self.media_offset))
 
         return all_fixation
 
@@ -97,19 +144,43 @@ class TobiiV2Recording(Recording):
 
         all_event = []
         with open(event_file, 'r') as f:
-            for _ in xrange(params.EVENTSHEADERLINES - 1):
+            for _ in range(params.EVENTSHEADERLINES - 1):
                 next(f)
-            reader = csv.DictReader(f, delimiter='\t')
-            for row in reader:
-                data = {"timestamp": cast_int(row["Timestamp"]),
-                        "event": row["Event"],
-                        "event_key": cast_int(row["EventKey"])}
-                if data["event"] == "LeftMouseClick" or data["event"] == "RightMouseClick":
-                    data.update({"x_coord": cast_int(row["Data1"]), "y_coord": cast_int(row["Data2"])})
-                elif data["event"] == "KeyPress":
-                    data.update({"key_code": cast_int(row["Data1"]), "key_name": row["Descriptor"]})
-                elif data["event"] == "LogData":
-                    data.update({"description": row["Data1"]})
+            # resolve the header columns to indices once, then split each row
+            # directly instead of having csv.DictReader build a dict per row
+            header = next(f).rstrip('\n').split('\t')
+            col_timestamp = header.index("Timestamp")
+            col_event = header.index("Event")
+            col_event_key = header.index("EventKey")
+            col_data1 = header.index("Data1")
+            col_data2 = header.index("Data2")
+            col_descriptor = header.index("Descriptor")
+
+            # one handler per event type, looked up in a dict instead of walking
+            # an if/elif chain of string comparisons for every row
+            def _mouse_click(data, row):
+                data.update({"x_coord": cast_int(row[col_data1]), "y_coord": cast_int(row[col_data2])})
+
+            def _key_press(data, row):
+                data.update({"key_code": cast_int(row[col_data1]), "key_name": row[col_descriptor]})
+
+            def _log_data(data, row):
+                data.update({"description": row[col_data1]})
+
+            handlers = {"LeftMouseClick": _mouse_click,
+                        "RightMouseClick": _mouse_click,
+                        "KeyPress": _key_press,
+                        "LogData": _log_data}
+
+            for line in f:
+                row = line.rstrip('\n').split('\t')
+                event = row[col_event]
+                data = {"timestamp": cast_int(row[col_timestamp]),
+                        "event": event,
+                        "event_key": cast_int(row[col_event_key])}
+                handler = handlers.get(event)
+                if handler is not None:
+                    handler(data, row)
                 all_event.append(Event(data, self.media_offset))
 
         return all_event
@@ -129,125 +200,186 @@ class TobiiV2Recording(Recording):
             a list of "Saccade"s
         """
 
+        # load only the needed columns and drop rows from other media (or with no
+        # eye tracker timestamp) with vectorized filters, so skipped rows never
+        # reach the state machine; _scan_saccades then runs over flat arrays
+        df = pd.read_csv(saccade_file, sep='\t',
+                         usecols=["MediaName", "EyeTrackerTimestamp", "RecordingTimestamp",
+                                  "GazeEventType", "SaccadeIndex",
+                                  "GazePointX (ADCSpx)", "GazePointY (ADCSpx)",
+                                  "FixationPointX (MCSpx)", "FixationPointY (MCSpx)",
+                                  "ValidityLeft", "ValidityRight"])
+        #        df = df[(df["MediaName"] == 'ScreenRec') & df["EyeTrackerTimestamp"].notna()]
+        df = df[(df["MediaName"] == 'Screen Recordings (1)') &
+                df["EyeTrackerTimestamp"].notna()]  # ignore non-recording data points
+
+        timestamps = df["RecordingTimestamp"].to_numpy(dtype=np.float64).astype(np.int64)
+
+        gaze_x = df["GazePointX (ADCSpx)"].to_numpy(dtype=np.float64)
+        gaze_y = df["GazePointY (ADCSpx)"].to_numpy(dtype=np.float64)
+        has_gazes = ~np.isnan(gaze_x) & ~np.isnan(gaze_y)
+        gaze_xs = np.where(has_gazes, gaze_x, 0).astype(np.int64)
+        gaze_ys = np.where(has_gazes, gaze_y, 0).astype(np.int64)
+
+        fix_x = df["FixationPointX (MCSpx)"].to_numpy(dtype=np.float64)
+        fix_y = df["FixationPointY (MCSpx)"].to_numpy(dtype=np.float64)
+        has_fixpts = ~np.isnan(fix_x) & ~np.isnan(fix_y)
+        fix_xs = np.where(has_fixpts, fix_x, 0).astype(np.int64)
+        fix_ys = np.where(has_fixpts, fix_y, 0).astype(np.int64)
+
+        validity_left = df["ValidityLeft"].to_numpy(dtype=np.float64)
+        validity_right = df["ValidityRight"].to_numpy(dtype=np.float64)
+        # missing validity codes compare False against 2, i.e. count as invalid
+        valids = (validity_left < 2) | (validity_right < 2)
+
+        gaze_events = df["GazeEventType"].to_numpy()
+        events = np.full(len(df), EV_UNCLASSIFIED, dtype=np.int8)
+        events[gaze_events == "Fixation"] = EV_FIXATION
+        events[gaze_events == "Saccade"] = EV_SACCADE
+
+        sac_index_col = df["SaccadeIndex"].to_numpy(dtype=np.float64)
+        sac_indices = np.where(np.isnan(sac_index_col), -1, sac_index_col).astype(np.int64)
+
+        saccades = _scan_saccades(timestamps, gaze_xs, gaze_ys, has_gazes,
+                                  fix_xs, fix_ys, has_fixpts, valids, events,
+                                  sac_indices, params.VALID_SAMPLES_PROP_SACCADE)
+
         all_saccade = []
-        with open(saccade_file, 'r') as f:
-            reader = csv.DictReader(f, delimiter='\t')
-            in_saccade = False
-            in_fixation = False
-            last_gaze_coord = (0, 0, 0)  # timestamp X Y
-            saccade_vect = []
-            saccade_duration = 0
-            current_index = 0
+        for (sac_index, start_time, duration, start_x, start_y,
+             end_x, end_y, dist, speed, quality) in saccades:
+            data = {"saccadeindex": int(sac_index),
+                    "timestamp": int(start_time),
+                    "saccadeduration": int(duration),
+                    "saccadestartpointx": int(start_x),
+                    "saccadestartpointy": int(start_y),
+                    "saccadeendpointx": int(end_x),
+                    "saccadeendpointy": int(end_y),
+                    "saccadedistance": dist,
+                    "saccadespeed": speed,
+                    "saccadeacceleration": -1,  # Recording.get_saccade_acceleration(saccade_vect)
+                    "saccadequality": quality
+                    }
+            all_saccade.append(Saccade(data, self.media_offset))
+
+        return all_saccade
 
+
+@_maybe_jit
+def _scan_saccades(timestamps, gaze_xs, gaze_ys, has_gazes, fix_xs, fix_ys,
+                   has_fixpts, valids, events, sac_indices, valid_prop_thresh):
+    """Runs the fixation/saccade state machine over pre-parsed sample arrays.
+
+    All arguments are flat arrays with one entry per retained sample (events is
+    coded with the EV_* constants). Returns one tuple per accepted saccade:
+    (index, start time, duration, start x, start y, end x, end y, distance,
+    speed, proportion of valid samples).
+    """
+    saccades = []
+    in_saccade = False
+    in_fixation = False
+    last_time = 0  # last gaze coordinate seen: timestamp X Y
+    last_x = 0
+    last_y = 0
+    last_valid = False
+    point_times = [0]  # gaze points of the current saccade
+    point_xs = [0]
+    point_ys = [0]
+    nb_invalid_temp = 0
+    nb_valid_sample = 0
+    nb_sample = 0
+    current_index = 0
+
+    for i in range(len(timestamps)):
+        event = events[i]
+
+        if in_fixation:
+            if event == EV_FIXATION:
+                nb_invalid_temp = 0
+            elif event == EV_SACCADE:  # new saccade
+                in_fixation = False
+                in_saccade = True
+                current_index = sac_indices[i]
+                point_times = [last_time]
+                point_xs = [last_x]
+                point_ys = [last_y]
+                nb_valid_sample = 0
+
+                # add current sample
+                if valids[i] and has_gazes[i]:  # ignore data point with no valid data
+                    point_times.append(timestamps[i])
+                    point_xs.append(gaze_xs[i])
+                    point_ys.append(gaze_ys[i])
+                    nb_valid_sample += 1
+
+                if last_valid:
+                    nb_valid_sample += 1
+
+                nb_sample = 2 + nb_invalid_temp  # current gaze sample + last gaze sample of the previous fixation + eventually all unclasified gaze samples in between
+                nb_invalid_temp = 0
+            else:  # unclassified gaze samples
+                nb_invalid_temp += 1
+
+        elif in_saccade:
+            if event == EV_FIXATION:
+                in_fixation = True
+                in_saccade = False
+
+                # end of last saccade
+                if valids[i] and has_gazes[i]:  # valid last datapoint
+                    point_times.append(timestamps[i])
+                    point_xs.append(gaze_xs[i])
+                    point_ys.append(gaze_ys[i])
+                    nb_valid_sample += 1
+                elif has_fixpts[i]:  # if gaze sample not valid, try to use fixation data instead
+                    point_times.append(timestamps[i])
+                    point_xs.append(fix_xs[i])
+                    point_ys.append(fix_ys[i])
+                    nb_valid_sample += 1
+                nb_sample += 1
+
+                rate_valid_sample = float(nb_valid_sample) / nb_sample
+                if rate_valid_sample >= valid_prop_thresh:  # if saccade quality is above the threshold
+                    saccade_duration = timestamps[i] - point_times[0]
+                    # cumulative Euclidean distance over the gaze points; a
+                    # plain accumulation loop keeps the kernel compilable by
+                    # numba (np.asarray on a list is not) and matches the
+                    # summation order of get_saccade_distance exactly
+                    dist = 0.0
+                    for j in range(1, len(point_xs)):
+                        dx = float(point_xs[j] - point_xs[j - 1])
+                        dy = float(point_ys[j] - point_ys[j - 1])
+                        dist += math.sqrt(dx * dx + dy * dy)
+                    speed = dist / saccade_duration
+                    saccades.append((current_index, point_times[0], saccade_duration,
+                                     point_xs[0], point_ys[0], point_xs[-1], point_ys[-1],
+                                     dist, speed, rate_valid_sample))
+                    nb_valid_sample = 0
+                    nb_sample = 0
+
+            elif event == EV_SACCADE:
+                if valids[i] and has_gazes[i]:  # ignore data point with no valid data
+                    point_times.append(timestamps[i])
+                    point_xs.append(gaze_xs[i])
+                    point_ys.append(gaze_ys[i])
+                    nb_valid_sample += 1
+                nb_sample += 1
+            else:  # unclassified gaze samples
+                nb_sample += 1
             nb_invalid_temp = 0
-            nb_valid_sample = 0
-            nb_sample = 0
-            last_valid = False
-
-            for row in reader:
-                #                if row["MediaName"] != 'ScreenRec' or not row["EyeTrackerTimestamp"]:
-                if row["MediaName"] != 'Screen Recordings (1)' or not row[
-                    "EyeTrackerTimestamp"]:  # ignore non-recording data point
-                    continue
-
-                if in_fixation:
-                    if row["GazeEventType"] == "Fixation":
-                        nb_invalid_temp = 0
-                    elif row["GazeEventType"] == "Saccade":  # new saccade
-                        in_fixation = False
-                        in_saccade = True
-                        current_index = row["SaccadeIndex"]
-                        saccade_vect = [last_gaze_coord]
-                        nb_valid_sample = 0
-
-                        # add current sample
-                        if (EMDAT_core.utils.cast_int(row["ValidityLeft"]) < 2 or EMDAT_core.utils.cast_int(
-                                row["ValidityRight"]) < 2) and row["GazePointX (ADCSpx)"] and row[
-                            "GazePointY (ADCSpx)"]:  # ignore data point with no valid data
-                            saccade_vect.append([EMDAT_core.utils.cast_int(row["RecordingTimestamp"]),
-                                                 EMDAT_core.utils.cast_int(row["GazePointX (ADCSpx)"]),
-                                                 EMDAT_core.utils.cast_int(row["GazePointY (ADCSpx)"])])
-                            nb_valid_sample += 1
-
-                        if last_valid:
-                            nb_valid_sample += 1
-
-                        nb_sample = 2 + nb_invalid_temp  # current gaze sample + last gaze sample of the previous fixation + eventually all unclasified gaze samples in between
-                        nb_invalid_temp = 0
-                    else:  # unclassified gaze samples
-                        nb_invalid_temp += 1
-
-                elif in_saccade:
-                    if row["GazeEventType"] == "Fixation":
-                        in_fixation = True
-                        in_saccade = False
-
-                        # end of last saccade
-                        if (EMDAT_core.utils.cast_int(row["ValidityLeft"]) < 2 or EMDAT_core.utils.cast_int(
-                                row["ValidityRight"]) < 2) and row["GazePointX (ADCSpx)"] and row[
-                            "GazePointY (ADCSpx)"]:  # valid last datapoint
-                            saccade_vect.append([EMDAT_core.utils.cast_int(row["RecordingTimestamp"]),
-                                                 EMDAT_core.utils.cast_int(row["GazePointX (ADCSpx)"]),
-                                                 EMDAT_core.utils.cast_int(row["GazePointY (ADCSpx)"])])
-                            nb_valid_sample += 1
-                        elif (row["FixationPointX (MCSpx)"] and row["FixationPointY (MCSpx)"]):  # if gaze sample not valid, try to use fixation data instead
-                            saccade_vect.append([EMDAT_core.utils.cast_int(row["RecordingTimestamp"]),
-                                                 EMDAT_core.utils.cast_int(row["FixationPointX (MCSpx)"]),
-                                                 EMDAT_core.utils.cast_int(row["FixationPointY (MCSpx)"])])
-                            nb_valid_sample += 1
-                        nb_sample += 1
-
-                        rate_valid_sample = float(nb_valid_sample) / nb_sample
-                        if rate_valid_sample >= params.VALID_SAMPLES_PROP_SACCADE:  # if saccade quality is above the threshold
-                            saccade_duration = EMDAT_core.utils.cast_int(row["RecordingTimestamp"]) - \
-                                               saccade_vect[0][0]
-                            dist = EMDAT_core.Recording.get_saccade_distance(saccade_vect)
-                            accel = -1  # Recording.get_saccade_acceleration(saccade_vect)
-                            speed = float(dist) / EMDAT_core.utils.cast_int(saccade_duration)
-                            data = {"saccadeindex": EMDAT_core.utils.cast_int(current_index),
-                                    "timestamp": saccade_vect[0][0],
-                                    "saccadeduration": EMDAT_core.utils.cast_int(saccade_duration),
-                                    "saccadestartpointx": saccade_vect[0][1],
-                                    "saccadestartpointy": saccade_vect[0][2],
-                                    "saccadeendpointx": saccade_vect[-1][1],
-                                    "saccadeendpointy": saccade_vect[-1][2],
-                                    "saccadedistance": dist,
-                                    "saccadespeed": speed,
-                                    "saccadeacceleration": accel,
-                                    "saccadequality": rate_valid_sample
-                                    }
-                            all_saccade.append(Saccade(data, self.media_offset))
-                            nb_valid_sample = 0
-                            nb_sample = 0
-
-                    elif row["GazeEventType"] == "Saccade":
-                        if (EMDAT_core.utils.cast_int(row["ValidityLeft"]) < 2 or EMDAT_core.utils.cast_int(
-                                row["ValidityRight"]) < 2) and row["GazePointX (ADCSpx)"] and row[
-                            "GazePointY (ADCSpx)"]:  # ignore data point with no valid data
-                            saccade_vect.append([EMDAT_core.utils.cast_int(row["RecordingTimestamp"]),
-                                                 EMDAT_core.utils.cast_int(row["GazePointX (ADCSpx)"]),
-                                                 EMDAT_core.utils.cast_int(row["GazePointY (ADCSpx)"])])
-                            nb_valid_sample += 1
-                        nb_sample += 1
-                    else:  # unclassified gaze samples
-                        nb_sample += 1
-                    nb_invalid_temp = 0
-
-                else:  # wait for the first fixation
-                    if row["GazeEventType"] == "Fixation":
-                        in_fixation = True
-
-                if row["GazePointX (ADCSpx)"] and row["GazePointY (ADCSpx)"]:
-                    last_gaze_coord = (EMDAT_core.utils.cast_int(row["RecordingTimestamp"]),
-                                       EMDAT_core.utils.cast_int(row["GazePointX (ADCSpx)"]),
-                                       EMDAT_core.utils.cast_int(row["GazePointY (ADCSpx)"]))
-                    last_valid = (EMDAT_core.utils.cast_int(row["ValidityLeft"]) < 2 or EMDAT_core.utils.cast_int(
-                        row["ValidityRight"]) < 2)
-                elif row["GazeEventType"] == "Fixation" and row["FixationPointX (MCSpx)"] and row[
-                    "FixationPointY (MCSpx)"]:  # if last sample not valid, at least check if valid data about the fixation
-                    last_gaze_coord = (EMDAT_core.utils.cast_int(row["RecordingTimestamp"]),
-                                       EMDAT_core.utils.cast_int(row["FixationPointX (MCSpx)"]),
-                                       EMDAT_core.utils.cast_int(row["FixationPointY (MCSpx)"]))
-                    last_valid = True
 
-        return all_saccade
+        else:  # wait for the first fixation
+            if event == EV_FIXATION:
+                in_fixation = True
+
+        if has_gazes[i]:
+            last_time = timestamps[i]
+            last_x = gaze_xs[i]
+            last_y = gaze_ys[i]
+            last_valid = valids[i]
+        elif event == EV_FIXATION and has_fixpts[i]:  # if last sample not valid, at least check if valid data about the fixation
+            last_time = timestamps[i]
+            last_x = fix_xs[i]
+            last_y = fix_ys[i]
+            last_valid = True
+
+    return saccades
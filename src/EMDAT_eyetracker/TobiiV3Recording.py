@@ -9,63 +9,85 @@ Institution: The University of British Columbia.
 """
 
 from EMDAT_core.Recording import Recording
-from EMDAT_core.data_structures import Datapoint, Fixation, Saccade, Event
+from EMDAT_core.data_structures import Datapoint, DatapointArray, Fixation, Saccade, Event
 import EMDAT_core.utils
+from array import array
 import csv
+import numpy as np
+import pandas as pd
 import params
 
 
 class TobiiV3Recording(Recording):
+    def _parse_rows(self, data_file):
+        """Returns the rows of data_file as a list of dicts, parsing each file at most once.
+
+        Tobii V3 exports bundle the samples, fixations and saccades in the same
+        TSV, so the readers below would otherwise each re-read and re-parse the
+        whole file. The parsed rows are cached on the instance per filename.
+        """
+        if not hasattr(self, "_row_cache"):
+            self._row_cache = {}
+        if data_file not in self._row_cache:
+            # pandas' C tokenizer splits the file far faster than csv.DictReader;
+            # dtype=str with na_filter=False keeps every cell a plain string
+            # ("" for empty) exactly as DictReader delivered them
+            frame = pd.read_csv(data_file, sep='\t', dtype=str, na_filter=False,
+                                memory_map=True)
+            self._row_cache[data_file] = frame.to_dict('records')
+        return self._row_cache[data_file]
+
+    def clean_memory(self):
+        Recording.clean_memory(self)
+        self._row_cache = {}
+
     def read_all_data(self, all_file):
-        """Returns a list of "Datapoint"s read from an data file.
+        """Returns the samples read from an data file as a "DatapointArray".
 
         Args:
             all_file:A string containing the name of the data file output by the Tobii software.
 
         Returns:
-            a list of "Datapoint"s
+            a DatapointArray (a list-compatible structure-of-arrays of "Datapoint"s)
         """
-        all_data = []
-        with open(all_file, 'r') as f:
-            reader = csv.DictReader(f, delimiter="\t")
-            last_pupil_left = -1
-            last_pupil_right = -1
-            last_time = -1
-
-            for row in reader:
-                #                if row["MediaName"] != 'ScreenRec':
-                #                 if row["MediaName"] != 'Screen Recordings (1)':  # ignore non-recording data point
-                #                     continue
-                if not row["ValidityLeft"] or not row["ValidityRight"]:  # ignore data point with no validity information
-                    continue
-                gaze_point_x = EMDAT_core.utils.cast_float(row["avg_x"], -1)
-                gaze_point_y = EMDAT_core.utils.cast_float(row["avg_y"], -1)
-                pupil_left = None  # EMDAT_core.utils.cast_float(row["PupilLeft"], -1)
-                pupil_right = None  # EMDAT_core.utils.cast_float(row["PupilRight"], -1)
-                distance_left = None  # EMDAT_core.utils.cast_float(row["DistanceLeft"], -1)
-                distance_right = None  # EMDAT_core.utils.cast_float(row["DistanceRight"], -1)
-                timestamp = int(float(row["RecordingTimestamp"]))
-                data = {'participant_name': row["ParticipantName"],
-                        "timestamp": timestamp,
-                        "pupilsize": EMDAT_core.Recording.get_pupil_size(pupil_left, pupil_right),
-                        "pupilvelocity": EMDAT_core.Recording.get_pupil_velocity(last_pupil_left, last_pupil_right,
-                                                                                 pupil_left, pupil_right,
-                                                                                 (timestamp - last_time)),
-                        "distance": EMDAT_core.Recording.get_distance(distance_left, distance_right),
-                        "is_valid": EMDAT_core.utils.cast_int(row["ValidityRight"]) < 2 or EMDAT_core.utils.cast_int(
-                            row["ValidityLeft"]) < 2,
-                        "is_valid_blink": EMDAT_core.utils.cast_int(
-                            row["ValidityRight"]) < 2 and EMDAT_core.utils.cast_int(row["ValidityLeft"]) < 2,
-                        "stimuliname": "Screen Recordings (1)",  # row["MediaName"],
-                        "fixationindex": EMDAT_core.utils.cast_int(row["FixationIndex"]),
-                        "gazepointx": gaze_point_x,
-                        "gazepointy": gaze_point_y}
-                all_data.append(Datapoint(data))
-                last_pupil_left = pupil_left
-                last_pupil_right = pupil_right
-                last_time = timestamp
-
-        return all_data
+        timestamps = []
+        fixation_indices = []
+        gaze_xs = []
+        gaze_ys = []
+        is_valids = []
+        is_valid_blinks = []
+
+        for row in self._parse_rows(all_file):
+            #                if row["MediaName"] != 'ScreenRec':
+            #                 if row["MediaName"] != 'Screen Recordings (1)':  # ignore non-recording data point
+            #                     continue
+            if not row["ValidityLeft"] or not row["ValidityRight"]:  # ignore data point with no validity information
+                continue
+            validity_left = EMDAT_core.utils.cast_int(row["ValidityLeft"])
+            validity_right = EMDAT_core.utils.cast_int(row["ValidityRight"])
+            gaze_point_x = EMDAT_core.utils.cast_float(row["avg_x"], -1)
+            gaze_point_y = EMDAT_core.utils.cast_float(row["avg_y"], -1)
+            fixation_index = EMDAT_core.utils.cast_int(row["FixationIndex"])
+            timestamps.append(int(float(row["RecordingTimestamp"])))
+            fixation_indices.append(np.nan if fixation_index is None else fixation_index)
+            gaze_xs.append(np.nan if gaze_point_x is None else gaze_point_x)
+            gaze_ys.append(np.nan if gaze_point_y is None else gaze_point_y)
+            is_valids.append(validity_right < 2 or validity_left < 2)
+            is_valid_blinks.append(validity_right < 2 and validity_left < 2)
+
+        # the whole recording is kept as one array per field instead of a
+        # Datapoint object per sample; pupil size and head distance are not
+        # exported for this dataset, so every sample carries the -1 sentinel
+        # those helpers return for missing data
+        n = len(timestamps)
+        return DatapointArray(np.asarray(timestamps, dtype=np.int64),
+                              np.full(n, -1.0), np.full(n, -1.0), np.full(n, -1.0),
+                              np.asarray(is_valids, dtype=np.bool_),
+                              is_valid_blinks=np.asarray(is_valid_blinks, dtype=np.bool_),
+                              fixationindices=np.asarray(fixation_indices, dtype=np.float64),
+                              gazepointxs=np.asarray(gaze_xs, dtype=np.float64),
+                              gazepointys=np.asarray(gaze_ys, dtype=np.float64),
+                              stimuliname="Screen Recordings (1)")  # row["MediaName"]
 
     def read_fixation_data(self, fixation_file):
         """Returns a list of "Fixation"s read from the data file file.
@@ -78,25 +100,23 @@ class TobiiV3Recording(Recording):
         """
 
         all_fixation = []
-        with open(fixation_file, 'r') as f:
-            currentfix = 0
-            reader = csv.DictReader(f, delimiter='\t')
-            for row in reader:
-                #                if row["MediaName"] != 'ScreenRec':
-                # if row["MediaName"] != 'Screen Recordings (1)':  # ignore non-recording data point
-                #     continue
-                if not row["ValidityLeft"] or not row["ValidityRight"] or \
-                        not row["FixationPointX"] or not row["FixationPointY"]:  # ignore data point with no information
-                    continue
-                if row["GazeEventType"] != "Fixation" or currentfix == row["FixationIndex"]:  # if not a fixation or the current fixation
-                    continue
-                data = {"fixationindex": EMDAT_core.utils.cast_int(row["FixationIndex"]),
-                        "timestamp": int(float(row["RecordingTimestamp"])),
-                        "fixationduration": EMDAT_core.utils.cast_int(row["GazeEventDuration"]),
-                        "fixationpointx": EMDAT_core.utils.cast_int(row["FixationPointX"]),
-                        "fixationpointy": EMDAT_core.utils.cast_int(row["FixationPointY"])}
-                all_fixation.append(Fixation(data, self.media_offset))
-                currentfix = row["FixationIndex"]
+        currentfix = 0
+        for row in self._parse_rows(fixation_file):
+            #                if row["MediaName"] != 'ScreenRec':
+            # if row["MediaName"] != 'Screen Recordings (1)':  # ignore non-recording data point
+            #     continue
+            if not row["ValidityLeft"] or not row["ValidityRight"] or \
+                    not row["FixationPointX"] or not row["FixationPointY"]:  # ignore data point with no information
+                continue
+            if row["GazeEventType"] != "Fixation" or currentfix == row["FixationIndex"]:  # if not a fixation or the current fixation
+                continue
+            data = {"fixationindex": EMDAT_core.utils.cast_int(row["FixationIndex"]),
+                    "timestamp": int(float(row["RecordingTimestamp"])),
+                    "fixationduration": EMDAT_core.utils.cast_int(row["GazeEventDuration"]),
+                    "fixationpointx": EMDAT_core.utils.cast_int(row["FixationPointX"]),
+                    "fixationpointy": EMDAT_core.utils.cast_int(row["FixationPointY"])}
+            all_fixation.append(Fixation(data, self.media_offset))
+            currentfix = row["FixationIndex"]
 
         return all_fixation
 
@@ -111,121 +131,138 @@ class TobiiV3Recording(Recording):
         """
 
         all_saccade = []
-        with open(saccade_file, 'r') as f:
-            reader = csv.DictReader(f, delimiter='\t')
-            in_saccade = False
-            in_fixation = False
-            last_gaze_coord = (0, 0, 0)  # timestamp X Y
-            saccade_vect = []
-            saccade_duration = 0
-            current_index = 0
-
-            nb_invalid_temp = 0
-            nb_valid_sample = 0
-            nb_sample = 0
-            last_valid = False
-
-            for row in reader:
-                #                if row["MediaName"] != 'ScreenRec' or not row["EyeTrackerTimestamp"]:
-                # if row["MediaName"] != 'Screen Recordings (1)' or not row[
-                #     "EyeTrackerTimestamp"]:  # ignore non-recording data point
-                #     continue
-
-                if in_fixation:
-                    if row["GazeEventType"] == "Fixation":
-                        nb_invalid_temp = 0
-                    elif row["GazeEventType"] == "Saccade":  # new saccade
-                        in_fixation = False
-                        in_saccade = True
-                        current_index = row["SaccadeIndex"]
-                        saccade_vect = [last_gaze_coord]
-                        nb_valid_sample = 0
-
-                        # add current sample
-                        if (EMDAT_core.utils.cast_int(row["ValidityLeft"]) < 2 or EMDAT_core.utils.cast_int(
-                                row["ValidityRight"]) < 2) and row["avg_x"] and row["avg_y"]:  # ignore data point with no valid data
-                            saccade_vect.append([EMDAT_core.utils.cast_int(row["RecordingTimestamp"]),
-                                                 EMDAT_core.utils.cast_int(row["avg_x"]),
-                                                 EMDAT_core.utils.cast_int(row["avg_y"])])
-                            nb_valid_sample += 1
-
-                        if last_valid:
-                            nb_valid_sample += 1
-
-                        nb_sample = 2 + nb_invalid_temp  # current gaze sample + last gaze sample of the previous fixation + eventually all unclasified gaze samples in between
-                        nb_invalid_temp = 0
-                    else:  # unclassified gaze samples
-                        nb_invalid_temp += 1
-
-                elif in_saccade:
-                    if row["GazeEventType"] == "Fixation":
-                        in_fixation = True
-                        in_saccade = False
-
-                        # end of last saccade
-                        if (EMDAT_core.utils.cast_int(row["ValidityLeft"]) < 2 or EMDAT_core.utils.cast_int(
-                                row["ValidityRight"]) < 2) and row["avg_x"] and row["avg_y"]:  # valid last datapoint
-                            saccade_vect.append([int(float(row["RecordingTimestamp"])),
-                                                 int(float(row["avg_x"])),
-                                                 int(float(row["avg_y"]))])
-                            nb_valid_sample += 1
-                        elif row["FixationPointX"] and row[
-                            "FixationPointY"]:  # if gaze sample not valid, try to use fixation data instead
-                            saccade_vect.append([int(float(row["RecordingTimestamp"])),
-                                                 int(float(row["FixationPointX"])),
-                                                 int(float(row["FixationPointY"]))])
-                            nb_valid_sample += 1
-                        nb_sample += 1
-
-                        rate_valid_sample = float(nb_valid_sample) / nb_sample
-                        if rate_valid_sample >= params.VALID_SAMPLES_PROP_SACCADE:  # if saccade quality is above the threshold
-                            saccade_duration = int(float(row["RecordingTimestamp"])) - saccade_vect[0][0]
-                            dist = EMDAT_core.Recording.get_saccade_distance(saccade_vect)
-                            accel = -1  # Recording.get_saccade_acceleration(saccade_vect)
-                            speed = float(dist) / float(saccade_duration)
-                            data = {"saccadeindex": int(current_index),
-                                    "timestamp": saccade_vect[0][0],
-                                    "saccadeduration": int(saccade_duration),
-                                    "saccadestartpointx": saccade_vect[0][1],
-                                    "saccadestartpointy": saccade_vect[0][2],
-                                    "saccadeendpointx": saccade_vect[-1][1],
-                                    "saccadeendpointy": saccade_vect[-1][2],
-                                    "saccadedistance": dist,
-                                    "saccadespeed": speed,
-                                    "saccadeacceleration": accel,
-                                    "saccadequality": rate_valid_sample
-                                    }
-                            all_saccade.append(Saccade(data, self.media_offset))
-                            nb_valid_sample = 0
-                            nb_sample = 0
-
-                    elif row["GazeEventType"] == "Saccade":
-                        if (EMDAT_core.utils.cast_int(row["ValidityLeft"]) < 2 or EMDAT_core.utils.cast_int(
-                                row["ValidityRight"]) < 2) and row["avg_x"] and row["avg_y"]:  # ignore data point with no valid data
-                            saccade_vect.append([int(float(row["RecordingTimestamp"])),
-                                                 int(float(row["avg_x"])),
-                                                 int(float(row["avg_y"]))])
-                            nb_valid_sample += 1
-                        nb_sample += 1
-                    else:  # unclassified gaze samples
-                        nb_sample += 1
+        in_saccade = False
+        in_fixation = False
+        last_gaze_coord = (0, 0, 0)  # timestamp X Y
+        # gaze points of the current saccade as three flat scalar buffers, which
+        # store raw machine ints instead of a 3-item list of boxed ints per point
+        saccade_times = array('q')
+        saccade_xs = array('q')
+        saccade_ys = array('q')
+        saccade_duration = 0
+        current_index = 0
+
+        nb_invalid_temp = 0
+        nb_valid_sample = 0
+        nb_sample = 0
+        last_valid = False
+
+        for row in self._parse_rows(saccade_file):
+            #                if row["MediaName"] != 'ScreenRec' or not row["EyeTrackerTimestamp"]:
+            # if row["MediaName"] != 'Screen Recordings (1)' or not row[
+            #     "EyeTrackerTimestamp"]:  # ignore non-recording data point
+            #     continue
+
+            # the validity casts are needed in up to three places per row, so
+            # compute the verdict once up front; rows without a validity code
+            # (e.g. unclassified no-eye samples) count as invalid
+            validity_left = EMDAT_core.utils.cast_int(row["ValidityLeft"])
+            validity_right = EMDAT_core.utils.cast_int(row["ValidityRight"])
+            valid_sample = ((validity_left is not None and validity_left < 2) or
+                            (validity_right is not None and validity_right < 2))
+
+            if in_fixation:
+                if row["GazeEventType"] == "Fixation":
                     nb_invalid_temp = 0
-
-                else:  # wait for the first fixation
-                    if row["GazeEventType"] == "Fixation":
-                        in_fixation = True
-
-                if row["avg_x"] and row["avg_y"]:
-                    last_gaze_coord = (int(float(row["RecordingTimestamp"])),
-                                       int(float(row["avg_x"])),
-                                       int(float(row["avg_y"])))
-                    last_valid = (EMDAT_core.utils.cast_int(row["ValidityLeft"]) < 2 or
-                                  EMDAT_core.utils.cast_int(row["ValidityRight"]) < 2)
-                elif row["GazeEventType"] == "Fixation" and row["FixationPointX"] and row["FixationPointY"]:  # if last sample not valid, at least check if valid data about the fixation
-                    last_gaze_coord = (int(float(row["RecordingTimestamp"])),
-                                       int(float(row["FixationPointX"])),
-                                       int(float(row["FixationPointY"])))
-                    last_valid = True
+                elif row["GazeEventType"] == "Saccade":  # new saccade
+                    in_fixation = False
+                    in_saccade = True
+                    current_index = row["SaccadeIndex"]
+                    saccade_times = array('q', last_gaze_coord[0:1])
+                    saccade_xs = array('q', last_gaze_coord[1:2])
+                    saccade_ys = array('q', last_gaze_coord[2:3])
+                    nb_valid_sample = 0
+
+                    # add current sample
+                    if valid_sample and row["avg_x"] and row["avg_y"]:  # ignore data point with no valid data
+                        saccade_times.append(EMDAT_core.utils.cast_int(row["RecordingTimestamp"]))
+                        saccade_xs.append(EMDAT_core.utils.cast_int(row["avg_x"]))
+                        saccade_ys.append(EMDAT_core.utils.cast_int(row["avg_y"]))
+                        nb_valid_sample += 1
+
+                    if last_valid:
+                        nb_valid_sample += 1
+
+                    nb_sample = 2 + nb_invalid_temp  # current gaze sample + last gaze sample of the previous fixation + eventually all unclasified gaze samples in between
+                    nb_invalid_temp = 0
+                else:  # unclassified gaze samples
+                    nb_invalid_temp += 1
+
+            elif in_saccade:
+                if row["GazeEventType"] == "Fixation":
+                    in_fixation = True
+                    in_saccade = False
+
+                    # end of last saccade
+                    if valid_sample and row["avg_x"] and row["avg_y"]:  # valid last datapoint
+                        saccade_times.append(int(float(row["RecordingTimestamp"])))
+                        saccade_xs.append(int(float(row["avg_x"])))
+                        saccade_ys.append(int(float(row["avg_y"])))
+                        nb_valid_sample += 1
+                    elif row["FixationPointX"] and row[
+                        "FixationPointY"]:  # if gaze sample not valid, try to use fixation data instead
+                        saccade_times.append(int(float(row["RecordingTimestamp"])))
+                        saccade_xs.append(int(float(row["FixationPointX"])))
+                        saccade_ys.append(int(float(row["FixationPointY"])))
+                        nb_valid_sample += 1
+                    nb_sample += 1
+
+                    rate_valid_sample = float(nb_valid_sample) / nb_sample
+                    if rate_valid_sample >= params.VALID_SAMPLES_PROP_SACCADE:  # if saccade quality is above the threshold
+                        saccade_duration = int(float(row["RecordingTimestamp"])) - saccade_times[0]
+                        # cumulative Euclidean distance straight over the buffers
+                        xs = np.frombuffer(saccade_xs, dtype=np.int64).astype(np.float64)
+                        ys = np.frombuffer(saccade_ys, dtype=np.int64).astype(np.float64)
+                        dist = np.hypot(np.diff(xs), np.diff(ys)).sum()
+                        accel = -1  # Recording.get_saccade_acceleration(saccade_vect)
+                        speed = float(dist) / float(saccade_duration)
+                        data = {"saccadeindex": int(current_index),
+                                "timestamp": saccade_times[0],
+                                "saccadeduration": int(saccade_duration),
+                                "saccadestartpointx": saccade_xs[0],
+                                "saccadestartpointy": saccade_ys[0],
+                                "saccadeendpointx": saccade_xs[-1],
+                                "saccadeendpointy": saccade_ys[-1],
+                                "saccadedistance": dist,
+                                "saccadespeed": speed,
+                                "saccadeacceleration": accel,
+                                "saccadequality": rate_valid_sample
+                                }
+                        all_saccade.append(Saccade(data, self.media_offset))
+                        nb_valid_sample = 0
+                        nb_sample = 0
+
+                elif row["GazeEventType"] == "Saccade":
+                    if valid_sample and row["avg_x"] and row["avg_y"]:  # ignore data point with no valid data
+                        saccade_times.append(int(float(row["RecordingTimestamp"])))
+                        saccade_xs.append(int(float(row["avg_x"])))
+                        saccade_ys.append(int(float(row["avg_y"])))
+                        nb_valid_sample += 1
+                    nb_sample += 1
+                else:  # unclassified gaze samples
+                    nb_sample += 1
+                nb_invalid_temp = 0
+
+            else:  # wait for the first fixation
+                if row["GazeEventType"] == "Fixation":
+                    in_fixation = True
+
+            if row["avg_x"] and row["avg_y"]:
+                last_gaze_coord = (int(float(row["RecordingTimestamp"])),
+                                   int(float(row["avg_x"])),
+                                   int(float(row["avg_y"])))
+                last_valid = valid_sample
+            elif row["GazeEventType"] == "Fixation" and row["FixationPointX"] and row["FixationPointY"]:  # if last sample not valid, at least check if valid data about the fixation
+                last_gaze_coord = (int(float(row["RecordingTimestamp"])),
+                                   int(float(row["FixationPointX"])),
+                                   int(float(row["FixationPointY"])))
+                last_valid = True
+
+        # read_saccade_data is the last reader to consume the shared parse
+        # (Recording.__init__ reads samples, then fixations, then saccades), so
+        # release the row dicts — the largest allocation of the V3 path — here
+        # instead of keeping them alive through Scene construction
+        self._row_cache.clear()
 
         return all_saccade
 
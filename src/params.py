@@ -189,6 +189,26 @@ PUPIL_ADJUSTMENT = "PCPS" 		#Normalization of pupil size based on the rsp follow
 RPSFILE = EYELOGDATAFOLDER + '/Preprocessing/PupilBaselines/all_rest_pupil_sizes.tsv'
 
 
+# ####################### Parallel processing #############################################################
+
+#Enable/disable building participants in parallel with one worker process per core.
+#Disable for strictly sequential runs (e.g. when reproducing step-by-step output order or debugging one participant)
+PARALLEL = True
+#PARALLEL = False
+
+#Enable/disable caching fully built participants on disk (under <datadir>/EMDAT/.cache).
+#On a rerun, participants whose data file is unchanged are loaded from the cache instead of being recomputed.
+#The cache entry is keyed by the data file's mtime and size, so touching the file invalidates it
+CACHE_PARTICIPANTS = False
+#CACHE_PARTICIPANTS = True
+
+#Enable/disable caching the parsed "All-Data" sample arrays on disk (under ~/.cache/emdat).
+#On a rerun, unchanged data files are loaded from the cache instead of being re-parsed.
+#The cache entry is keyed by the data file's path and mtime, so touching the file invalidates it
+CACHE_ALLDATA = False
+#CACHE_ALLDATA = True
+
+
 # ####################### Verbose/Debug mode ##############################################################
 
 #Enable/disable debug mode. In debug mode warnings are treated as errors, and the verbosity level is automatically set to "VERBOSE" (see below)
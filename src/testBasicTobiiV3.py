@@ -8,82 +8,126 @@ Sample code to run EMDAT for a given experiment.
 Institution: The University of British Columbia.
 """
 
-from BasicParticipant import * 
+from multiprocessing import freeze_support
+from BasicParticipant import read_participants_Basic
 from EMDAT_core.Participant import export_features_all, write_features_tsv
 from EMDAT_core.ValidityProcessing import output_Validity_info_Segments, output_percent_discarded, output_Validity_info_Participants
 from EMDAT_core.utils import log_to_file
 
+import logging
 import os
-import csv
-#reset output log
-# open(params.CANARY_OUTPUT_LOG, 'w').close()
-#
-# # extract user list from the pupilbaseline file
-# ul = []
-# with open(params.RPSFILE) as tsvfile:
-#     tsvreader = csv.reader(tsvfile, delimiter="\t")
-#     next(tsvreader, None)  # skip the headers
-#     for line in tsvreader:
-#         ul.append(line[0])
-#
-# log_to_file("Total number of participants read from pupil_baseline file: " + str(len(ul)) + "\n")
-#
-# #remove participants that EMDAT complains have no samples
-# p_no_samples = ['EL-114', 'EO-028', 'HI-045', 'EA-046', 'ET-171']
-#
-# for p in p_no_samples:
-#     ul.remove(p)
-#     log_to_file("Participant "+p+" removed as it had no samples!\n")
-#
-# log_to_file("Total number of participants removed due to lack of samples: " + str(len(p_no_samples)) + "\n")
-
-
-#ul = [7, 19, 26, 36, 38, 52, 57]
-
-#to debug with few participants
-# ul = ul[1:4]
-# ul = ['EA-149','EA-175']
-
-
-# user ids
-data_path = os.path.join('data', 'TobiiV3')
-uids = ul = os.listdir(r"C:\Users\Anuj\Desktop\Canary\Baseline\predicted_coordinates\pixel")
-uids = ul
-# time offsets from start of the recording
-#alogoffset = [0, 0, 0]
-
-# Read participants
-ps = read_participants_Basic(user_list=ul, pids=uids, datadir=params.EYELOGDATAFOLDER,
-                             prune_length=None,
-                             aoifile=None,
-                             require_valid_segs=True,
-                             auto_partition_low_quality_segments=False,
-                             rpsfile=None)
-
-output_path = os.path.join(r"C:\Users\Anuj\PycharmProjects\EMDAT-et-features-generation\src\outputfolder", 'output_featuresV3_2.tsv')
-write_features_tsv(ps, output_path, featurelist=params.featurelist,
-                   aoifeaturelabels=params.aoifeaturelist, id_prefix=True)
-
-#if params.DEBUG or params.VERBOSE == "VERBOSE":
-#    # explore_validation_threshold_segments(ps, auto_partition_low_quality_segments = False)
-#    output_Validity_info_Segments(ps, auto_partition_low_quality_segments_flag = False, validity_method = 3)
-#    output_percent_discarded(ps, './outputfolder/smi_disc.csv')
-#    output_Validity_info_Segments(ps, auto_partition_low_quality_segments_flag = False, validity_method = 2,
-#                              threshold_gaps_list = [100, 200, 250, 300], output_file = "./outputfolder/tobiiv3_Seg_val.csv")
-#    output_Validity_info_Participants(ps, include_restored_samples = True, auto_partition_low_quality_segments_flag = False)
-
-
-# WRITE features to file
-#if params.VERBOSE != "QUIET":#
-#    print#
-#    print "Exporting:\n--General:", params.featurelist
-#write_features_tsv(ps, params.EYELOGDATAFOLDER+'/outputfolder/EMDAT_features.tsv', featurelist=params.featurelist, id_prefix=True)
-
-aoi_feat_names = (map(lambda x:x, params.aoigeneralfeat))
-if params.VERBOSE != "QUIET":
-     print()
-     print("Exporting features:\n--General:", params.featurelist, "\n--AOI:", aoi_feat_names)#, "\n--Sequences:", params.aoisequencefeat)
-     
-write_features_tsv(ps, params.EYELOGDATAFOLDER+'/EMDAT/EMDAT_features.tsv',featurelist = params.featurelist,
-            aoifeaturelabels = params.aoifeaturelist, id_prefix = True)
-
+from pathlib import Path
+import pandas as pd
+import params
+
+# params.VERBOSE keeps controlling the per-participant diagnostics, now routed
+# through (buffered) logging instead of a print per line
+logging.basicConfig(format="%(message)s",
+                    level=logging.INFO if params.VERBOSE != "QUIET" else logging.WARNING)
+
+# the experiment's directories, built once as Path objects instead of ad hoc
+# string concatenations at every use site
+data_dir = Path(params.EYELOGDATAFOLDER)
+output_dir = Path(r"C:\Users\Anuj\PycharmProjects\EMDAT-et-features-generation\src\outputfolder")
+
+
+def validate_config():
+    """Fails fast on configuration errors before any participant is processed.
+
+    Reading and computing features for all participants takes a long time, so
+    the exported feature lists and the writability of every output location
+    are checked up front; a misconfigured run stops here instead of after the
+    compute.
+    """
+    if not params.featurelist:
+        raise Exception("params.featurelist is empty: no features to export.")
+    non_str = [f for f in list(params.featurelist) + list(params.aoifeaturelist)
+               if not isinstance(f, str)]
+    if non_str:
+        raise Exception("Feature names must be strings: " + repr(non_str))
+    for outdir in (output_dir, data_dir / 'EMDAT'):
+        if not os.access(outdir, os.W_OK):
+            raise Exception("Output directory is not writable: " + str(outdir))
+
+
+# the main guard keeps the participant pool from re-running this driver in
+# every worker during spawn bootstrap (required on Windows)
+if __name__ == '__main__':
+    freeze_support() #for windows
+
+    #reset output log
+    open(params.CANARY_OUTPUT_LOG, 'w').close()
+
+    # extract user list from the pupilbaseline file; one vectorized read of the
+    # participant column instead of a csv.reader loop over every row
+    ul = pd.read_csv(params.RPSFILE, sep="\t", usecols=[0], dtype=str).iloc[:, 0].tolist()
+
+    log_to_file(f"Total number of participants read from pupil_baseline file: {len(ul)}\n")
+
+    #remove participants that EMDAT complains have no samples
+    p_no_samples = ['EL-114', 'EO-028', 'HI-045', 'EA-046', 'ET-171']
+
+    # one pass over ul with set membership instead of an O(len(ul)) list.remove per
+    # participant; also tolerates names that are not in the baseline file
+    known = set(ul)
+    removed = [p for p in p_no_samples if p in known]
+    bad = set(removed)
+    ul = [u for u in ul if u not in bad]
+    for p in removed:
+        log_to_file(f"Participant {p} removed as it had no samples!\n")
+
+    log_to_file(f"Total number of participants removed due to lack of samples: {len(removed)}\n")
+
+    validate_config()
+
+
+    #ul = [7, 19, 26, 36, 38, 52, 57]
+
+    #to debug with few participants
+    # ul = ul[1:4]
+    # ul = ['EA-149','EA-175']
+
+
+    # user ids
+    data_path = Path('data') / 'TobiiV3'
+    # uids = ul = os.listdir(r"C:\Users\Anuj\Desktop\Canary\Baseline\predicted_coordinates\pixel")
+    uids = ul
+    # time offsets from start of the recording
+    #alogoffset = [0, 0, 0]
+
+    # announce what will be exported before the long read/compute phase, so a
+    # wrong feature selection is visible immediately
+    aoi_feat_names = list(params.aoigeneralfeat)
+    if params.VERBOSE != "QUIET":
+         print()
+         print("Exporting features:\n--General:", params.featurelist, "\n--AOI:", aoi_feat_names)#, "\n--Sequences:", params.aoisequencefeat)
+
+    # Read participants
+    ps = read_participants_Basic(user_list=ul, pids=uids, datadir=data_dir,
+                                 prune_length=None,
+                                 aoifile=None,
+                                 require_valid_segs=True,
+                                 auto_partition_low_quality_segments=False,
+                                 rpsfile=None)
+
+    output_path = output_dir / 'output_featuresV3_2.tsv'
+    write_features_tsv(ps, output_path, featurelist=params.featurelist,
+                       aoifeaturelabels=params.aoifeaturelist, id_prefix=True)
+
+    #if params.DEBUG or params.VERBOSE == "VERBOSE":
+    #    # explore_validation_threshold_segments(ps, auto_partition_low_quality_segments = False)
+    #    output_Validity_info_Segments(ps, auto_partition_low_quality_segments_flag = False, validity_method = 3)
+    #    output_percent_discarded(ps, './outputfolder/smi_disc.csv')
+    #    output_Validity_info_Segments(ps, auto_partition_low_quality_segments_flag = False, validity_method = 2,
+    #                              threshold_gaps_list = [100, 200, 250, 300], output_file = "./outputfolder/tobiiv3_Seg_val.csv")
+    #    output_Validity_info_Participants(ps, include_restored_samples = True, auto_partition_low_quality_segments_flag = False)
+
+
+    # WRITE features to file
+    #if params.VERBOSE != "QUIET":#
+    #    print#
+    #    print "Exporting:\n--General:", params.featurelist
+    #write_features_tsv(ps, params.EYELOGDATAFOLDER+'/outputfolder/EMDAT_features.tsv', featurelist=params.featurelist, id_prefix=True)
+
+    write_features_tsv(ps, data_dir / 'EMDAT' / 'EMDAT_features.tsv', featurelist = params.featurelist,
+                aoifeaturelabels = params.aoifeaturelist, id_prefix = True)